@@ -1,12 +1,13 @@
 from pathlib import Path
 import os
+import locale
 import re
 import pandas as pd
 import numpy as np
-import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from asammdf import MDF, Signal
 from asammdf.blocks.source_utils import Source
-from typing import List
 
 
 """
@@ -21,142 +22,134 @@ This script does the following:
 sourcePath = r"Originals\ExampleLog.log"
 
 
-# Create results folder if it doesn't exist
 ResultsFolder = "Results"
-if not os.path.exists(ResultsFolder): os.makedirs(ResultsFolder)
 
 
-# As we parse stuff, we'll store it in a dataframe. We can then export all columns to a CSV (for visual debugging) and some columns to an MF4.
-df = pd.DataFrame(columns=['Original', 'LogTimestamp', 'LogID', 'Ret', 'Sz', 'Blk', 'LogDataBytes', 'timestamps', 'echoByte', 'PGN', 'Priority', 'Source', 'Destination', 'DataBytes', 'DataLength', 'ID', 'BusChannel', 'IDE', 'DLC', 'Dir', 'EDL', 'BRS', 'PgnLabel', 'PgnInDbc'])
+# Columns of the CSV (for visual debugging). As we parse stuff, we'll store them in a dataframe. The original log line is added as first column right before exporting.
+# The values needed for the MF4 are kept in separate Numpy arrays.
+dfColumns = ['LogTimestamp', 'LogID', 'Ret', 'Sz', 'Blk', 'LogDataBytes', 'timestamps', 'echoByte', 'PGN', 'Priority', 'Source', 'Destination', 'DataBytes', 'DataLength', 'ID', 'BusChannel', 'IDE', 'DLC', 'Dir', 'EDL', 'BRS', 'PgnLabel', 'PgnInDbc']
 
-# Load PGN label table to match PGNs with human readable names. Taken from CSS Electronics (https://www.csselectronics.com/pages/j1939-pgn-conversion-tool  -> PGN list tab)
-pgn_df = pd.read_csv("PGN list.csv", sep=';')
+# Set to False to skip the CSV export. The CSV is only needed for visual debugging, and building it takes a good part of the run time on big logs
+exportCsv = True
 
+# The log is parsed in parallel, in up to numWorkers chunks of at least minChunkSize bytes each
+numWorkers   = os.cpu_count() or 1
+minChunkSize = 16*1024*1024
 
+# Other boilerplate columns. Taken from the demo.py script. Don't know how necessary they are for asammdf but I include them just in case
+# They have the same value for every frame, so they are not stored in the dataframe. They are only added when exporting the CSV and the MF4.
+boilerplateColumns = {
+    'BusChannel': 1,
+    'IDE': 1,   # The ID type (regular/extended)
+    'DLC': 8,   # Data length code (unless we use CAN FD, DataLength and DLC are the same)
+    'Dir': 1,   # The direction (received, transmitted)
+    'EDL': 1,   # Related to the Cyclic Redundancy Check
+    'BRS': 1,   # Bit Rate Switch. 0=Dominant, the CAN FD data frame is sent at the arbitration rate (i.e. up to max 1 Mbit/s). 1=Recessive, the remaining part of the data frame is sent at a higher bit rate (up to 5 Mbit/s).
+}
 
-def main():
-
-    with open(sourcePath, "r") as f_original:
-        
-        lines = f_original.readlines()
-
-        i = 0   # Line counter. Do NOT use an index with enumerate(), since there are lines we want to skip. Only increase i when we actually add a row to df
-
-        for line in lines:
-            
-            if ("Data:" not in line): continue   # Exit clause: Skip line if it has no data
+# PGN label table to match PGNs with human readable names. Taken from CSS Electronics (https://www.csselectronics.com/pages/j1939-pgn-conversion-tool  -> PGN list tab)
+pgnListPath = "PGN list.csv"
 
-            df.at[i,'Original'] = line.strip() # Store the whole original line so that it is included in the CSV. This makes it easier to debug visually for parsing errors. 
+# Regex pattern used to parse a whole log line in one go. Each named group becomes a column of the dataframe.
+# Some lines don't have a Blk, hence that part is optional.
+reLogLine = re.compile(r"^(?P<LogTimestamp>.*) \(.*?ID = (?P<LogID>[0-9]*).*?Ret = (?P<Ret>[0-9]*).*?Sz = (?P<Sz>[0-9]*)(?:.*?Blk = (?P<Blk>[0-9]*))?.*?Data: (?P<LogDataBytes>[0-9A-F ]*)")
 
 
-            ################################
-            #### Parse log entry values ####
-            ################################
-            """ We sniffed data using a Nexiq CAN sniffer. The application Device Tester software (v3.1.0.6) has a logging feature that we used to record the data.
-                The resulting log is not the actual CAN frame, but rather a proprietary format that includes the CAN frame plus extra info.
-            
-                Example of a line in the CAN sniffer's log:
-                000001.226604 (000.003827)  Rx() ID = 00 Ret = 0019 Sz = 02048 Blk = 1 Data:  00 11 EE B0 00 20 FF 00 03 00 FF 10 21 00 00 00 FF D0 FF
-                    The actual data about the CAN packet is encoded in those last 19 hex bytes. 
-                    This ID is unrelated to the CAN ID, so we'll name it differently (LogID) to avoid confusion.
-                    We also parse Ret, Sz and Blk, although as far as I know we won't need them.
-            """
 
-            # Get log entry timestamp
-            df.at[i,'LogTimestamp'] = re.search(r"^(.*) \(" , line).group(1)
-            
-            # Get log info: ID, Ret, Sz, Blk (no idea what they are, also this ID is completely unrelated to the CAN frame's ID)
-            df.at[i,'LogID'] = re.search("ID = ([0-9]*)" , line).group(1)
-            df.at[i,'Ret']   = re.search("Ret = ([0-9]*)" , line).group(1)
-            df.at[i,'Sz']    = re.search("Sz = ([0-9]*)" , line).group(1)
+def main():
 
-            blk = re.search("Blk = ([0-9]*)" , line)    # Some lines don't have a blk, hence we need an 'if'
-            if (blk): df.at[i,'Blk'] = blk.group(1)
+    # Create results folder if it doesn't exist
+    if not os.path.exists(ResultsFolder): os.makedirs(ResultsFolder)
 
-            # Get log entry data bytes (typically 19 bytes, the actual CAN frame is included here in a proprietary format)
-            dataBytes_hex = re.search("Data: ([0-9A-F ]*)" , line).group(1) # Get data as " 00 11 EE B0 00 20 FF 00 03 00 FF 10 21 00 00 00 FF D0 FF " 
-            dataLength = len(re.findall("( [0-9A-F]{2})", dataBytes_hex))   # Count how many groups of two chars we have
-            dataBytes_hex = dataBytes_hex.replace(" ","") # Remove spaces: "0011EEB00020FF000300FF1021000000FFD0FF"
-            df.at[i,'LogDataBytes'] = dataBytes_hex
+    ################################
+    #### Parse log entry values ####
+    ################################
+    # The log is split in chunks that are parsed in parallel, one process per chunk (see ParseLogChunk)
+    chunks = FindChunkOffsets(sourcePath, max(1, min(numWorkers, os.path.getsize(sourcePath)//minChunkSize)))
 
-            if (dataLength<19): continue    # Exit clause: Skip lines with anormally short DataBytes
+    if (len(chunks) == 1):
+        results = [ParseLogChunk(sourcePath, *chunks[0], exportCsv)]   # Small log: not worth starting other processes
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            results = list(executor.map(ParseLogChunk, [sourcePath]*len(chunks), *zip(*chunks), [exportCsv]*len(chunks)))   # Results come back in the same order as the chunks
 
+    frameBytes = np.concatenate([r[2] for r in results])
+    if (exportCsv):     # The original lines and the log entry values are only sent back if we need them for the CSV
+        lines = pd.concat([r[0] for r in results], ignore_index=True)
+        df    = pd.concat([r[1] for r in results], ignore_index=True)
+    del results
 
-            #################################
-            #### Parse CAN (J1939) frame ####
-            #################################
-            # The Nexiq CAN reader presents the DataBytes in a proprietary format.
-            # The following decoding is based on documentation from Nexiq's technical support.
-            # See included image "Log Format.png".
-            # (Recommended Practice, Proposed RP 1210C; RP1210C-FINAL.pdf, page 39, section 15.5: The J1939 Message from RP1210_ReadMessage)
-            timestamp_hex   = dataBytes_hex[0:8]
-            echoByte_hex    = dataBytes_hex[8:10]
-            pgn_hex         = dataBytes_hex[14:16] + dataBytes_hex[12:14] + dataBytes_hex[10:12]    # PGN given in little endian. Must reverse the bytes: 20 F3 00 -> 00 F3 20
-            priority_hex    = dataBytes_hex[16:18]
-            source_hex      = dataBytes_hex[18:20]
-            destination_hex = dataBytes_hex[20:22]
-            payload_hex     = dataBytes_hex[22:38]
 
+    #################################
+    #### Parse CAN (J1939) frame ####
+    #################################
+    # The Nexiq CAN reader presents the DataBytes in a proprietary format.
+    # The following decoding is based on documentation from Nexiq's technical support.
+    # See included image "Log Format.png".
+    # (Recommended Practice, Proposed RP 1210C; RP1210C-FINAL.pdf, page 39, section 15.5: The J1939 Message from RP1210_ReadMessage)
+    #
+    # The values needed for the MF4 are stored directly in Numpy arrays with their final type (one array per column), not in the dataframe.
+    numFrames = len(frameBytes)   # frameBytes holds the 19 bytes of each frame, already decoded from hex by ParseLogChunk. Numeric fields are taken from here
 
-            df.at[i,'timestamps']  = struct.unpack('!f', bytes.fromhex(timestamp_hex))[0]   # Convert hex to float   
-            df.at[i,'echoByte']    = echoByte_hex
-            df.at[i,'PGN']         = pgn_hex
-            df.at[i,'Priority']    = priority_hex
-            df.at[i,'Source']      = source_hex
-            df.at[i,'Destination'] = destination_hex
-            df.at[i,'DataBytes']   = payload_hex
-            df.at[i,'DataLength']  = len(payload_hex)//2    # Count pairs of characters in the payload. 2 hexadecimal characters are 1 byte
+    timestamps = np.ascontiguousarray(frameBytes[:, 0:4]).view('>f4').ravel().astype(np.float64)   # Convert hex to float: read the first 4 bytes of each frame as a big endian 32 bit float
+    dataBytes  = frameBytes[:, 11:19]                                                               # Payload, 8 bytes
+    dataLength = np.full(numFrames, dataBytes.shape[1], dtype=np.uint8)                             # Number of bytes in the payload
 
 
-            # Build the 29 bit Extended CAN ID:
-            #                  Extended Data Page
-            #       Priority     (AKA Reserved)     Data Page   PDU Format   PDU specific   Source Address
-            #       (3 bits)       (1 bit)           (1 bit)     (8 bits)      (8 bits)       (8 bits)
-            #                 |------------------- PGN (18 bits) ------------------------|
+    # Build the 29 bit Extended CAN ID:
+    #                  Extended Data Page
+    #       Priority     (AKA Reserved)     Data Page   PDU Format   PDU specific   Source Address
+    #       (3 bits)       (1 bit)           (1 bit)     (8 bits)      (8 bits)       (8 bits)
+    #                 |------------------- PGN (18 bits) ------------------------|
 
-            b1 = hexStr2binStr(priority_hex, 3) # Priority, 3 bits
-            b2 = hexStr2binStr(pgn_hex, 18)     # PGN, 18 bits
-            b3 = hexStr2binStr(source_hex, 8)   # Source, 8 bits
-            ID = b1 + b2 + b3                      # Concatenate binary strings
-            #print(b1, b2, b3, " --->  ID", ID, "  Length: ", len(ID), " bits")   # For debugging
-            df.at[i,'ID'] = binStr2HexStr(ID)      # Convert back to hexadecimal (ex: "CFF2303")
+    # The fields are taken directly as integers from the raw bytes of the frame, and the ID is assembled with bitwise operations on the whole column at once
+    priority_int = frameBytes[:, 8].astype(np.uint32)                                                             # Priority, 3 bits
+    pgn_int      = frameBytes[:, 7].astype(np.uint32) << 16 | frameBytes[:, 6].astype(np.uint32) << 8 | frameBytes[:, 5]  # PGN, 18 bits (little endian in the frame)
+    source_int   = frameBytes[:, 9].astype(np.uint32)                                                             # Source, 8 bits
+    ids = (priority_int & 0x7) << 26 | (pgn_int & 0x3FFFF) << 8 | (source_int & 0xFF)
 
 
-            # Other boilerplate columns. Taken from the demo.py script. Don't know how necessary they are for asammdf but I include them just in case
-            df.at[i,'BusChannel'] = 1
-            df.at[i,'IDE'] = 1  # The ID type (regular/extended)
-            df.at[i,'DLC'] = 8  # Data length code (unless we use CAN FD, DataLength and DLC are the same)
-            df.at[i,'Dir'] = 1  # The direction (received, transmitted)
-            df.at[i,'EDL'] = 1  # Related to the Cyclic Redundancy Check
-            df.at[i,'BRS'] = 1  # Bit Rate Switch. 0=Dominant, the CAN FD data frame is sent at the arbitration rate (i.e. up to max 1 Mbit/s). 1=Recessive, the remaining part of the data frame is sent at a higher bit rate (up to 5 Mbit/s).
 
 
-            # Lookup CSS Electronics' PGN table to get a human readable name for the PGN (e.g. "Electronic Brake Controller 1"),
-            # plus a note on whether or not the frame can be decoded with CSS' paid DBC dictionary (https://www.csselectronics.com/products/j1939-dbc-file)
-            pgn_dec = int(pgn_hex, 16)     # Get PGN in decimal
+    ####################################
+    ## Prepare the CSV file
+    ####################################
+    # This is mostly for visual debugging in case there's a parsing error
+    # Warning: Excel formats some cells incorrectly (e.g. hexadecimal 30000003 gets interpreted as a decimal).
+    #          Open the CSV as text or with some dumb CSV viewer that doesn't try to infer formats.
+    # The columns that are only useful for debugging (hex strings, PGN labels...) are only built if we export the CSV.
+    if (exportCsv):
+        dataBytes_hex = df['LogDataBytes']
 
-            pgn_label_row = pgn_df[pgn_df["PGN"] == pgn_dec]  # Find subset of rows with matching PGN
-            if (not pgn_label_row.empty):                       # If we found a match
-                df.at[i,'PgnLabel'] = pgn_label_row.iloc[0]["PGN label"]                  # And get the first row in the subset, second column
-                df.at[i,'PgnInDbc'] = pgn_label_row.iloc[0]["In CSS electronics' DBC?"]   # And get the first row in the subset, third column
+        df['echoByte']    = dataBytes_hex.str[8:10]
+        df['PGN']         = dataBytes_hex.str[14:16] + dataBytes_hex.str[12:14] + dataBytes_hex.str[10:12]    # PGN given in little endian. Must reverse the bytes: 20 F3 00 -> 00 F3 20
+        df['Priority']    = dataBytes_hex.str[16:18]
+        df['Source']      = dataBytes_hex.str[18:20]
+        df['Destination'] = dataBytes_hex.str[20:22]
+        df['DataBytes']   = dataBytes_hex.str[22:38]
 
+        df['timestamps']  = timestamps
+        df['DataLength']  = dataLength
+        df['ID']          = pd.Series(ids).map("{0:0>4X}".format)   # Write the ID in hexadecimal (ex: "CFF2303")
 
 
-            i += 1  # If we hit any exit clause, this index won't get increased, so the unfinished row will get overwritten on the next iteration
+        # Lookup CSS Electronics' PGN table to get a human readable name for the PGN (e.g. "Electronic Brake Controller 1"),
+        # plus a note on whether or not the frame can be decoded with CSS' paid DBC dictionary (https://www.csselectronics.com/products/j1939-dbc-file)
+        # The table is indexed by PGN (in decimal), so each frame is a hash lookup instead of a search through the table. If there are repeated PGNs in the table, the first one is used
+        pgnLabels = LoadPgnTable(pgnListPath).drop_duplicates("PGN").set_index("PGN")
+        df['PgnLabel'] = pgnLabels["PGN label"].reindex(pgn_int).to_numpy()                  # PGNs not found in the table are left empty
+        df['PgnInDbc'] = pgnLabels["In CSS electronics' DBC?"].reindex(pgn_int).to_numpy()
 
 
+        df = df.assign(**boilerplateColumns)[dfColumns]   # Add the boilerplate columns and sort columns in the order we want them in the CSV
+        df.insert(0, 'Original', lines)                    # Include the whole original line in the CSV. This makes it easier to debug visually for parsing errors.
 
+        filename = Path(sourcePath).stem + ".csv"
+        pathResultCsv = os.path.join(ResultsFolder, filename)
 
-    ####################################
-    ## Prepare the CSV file
-    ####################################
-    # This is mostly for visual debugging in case there's a parsing error
-    # Warning: Excel formats some cells incorrectly (e.g. hexadecimal 30000003 gets interpreted as a decimal).
-    #          Open the CSV as text or with some dumb CSV viewer that doesn't try to infer formats.
-    filename = Path(sourcePath).stem + ".csv"
-    pathResultCsv = os.path.join(ResultsFolder, filename)
+        df.to_csv(pathResultCsv, sep=";", index=False, chunksize=100_000, lineterminator="\n")   # Written in chunks of rows, so the whole text of a big CSV is never held in memory at once
 
-    df.to_csv(pathResultCsv, sep=";", index=False)
+        del df, lines, dataBytes_hex   # Not needed for the MF4
 
 
 
@@ -168,26 +161,20 @@ def main():
     # Doing it like this is the only way I've found to have an MF4 file that can be loaded into asammdf AND have the Bus Logging tab active.
     # The Bus Logging tab is where we load a DBC dictionary to extract signals.
 
-    timestampsList = df['timestamps'].tolist()
-
     samples = []
 
-    samples.append( np.array(df['BusChannel'].values, dtype=np.uint32) ) # BusChannel
-
-    aux = np.array(df['ID'].apply(int, base=16).values) # Convert whole column from hex string to int, and then convert df column to Numpy array
-    samples.append(aux)#, dtype=np.uint64) ) # ID
+    samples.append( np.full(numFrames, boilerplateColumns['BusChannel'], dtype=np.uint8) ) # BusChannel
 
-    samples.append( np.array(df['IDE'].values, dtype=np.uint32) ) # IDE
-    samples.append( np.array(df['DLC'].values, dtype=np.uint32) ) # DLC
-    samples.append( np.array(df['DataLength'].values, dtype=np.uint32) ) # DataLength
-    samples.append( np.array(df['Dir'].values, dtype=np.uint32) ) # Dir
-    samples.append( np.array(df['EDL'].values, dtype=np.uint32) ) # EDL
-    samples.append( np.array(df['BRS'].values, dtype=np.uint32) ) # BRS
+    samples.append( ids ) # ID
 
-    auxCol = ColumnHexToListOfInts(df['DataBytes'])
-    auxNpArray = np.array(auxCol)#, dtype=np.dtype('(8,)u1') )
-    samples.append( auxNpArray ) # DataBytes
+    samples.append( np.full(numFrames, boilerplateColumns['IDE'], dtype=np.uint8) ) # IDE
+    samples.append( np.full(numFrames, boilerplateColumns['DLC'], dtype=np.uint8) ) # DLC
+    samples.append( dataLength ) # DataLength
+    samples.append( np.full(numFrames, boilerplateColumns['Dir'], dtype=np.uint8) ) # Dir
+    samples.append( np.full(numFrames, boilerplateColumns['EDL'], dtype=np.uint8) ) # EDL
+    samples.append( np.full(numFrames, boilerplateColumns['BRS'], dtype=np.uint8) ) # BRS
 
+    samples.append( dataBytes ) # DataBytes
 
 
     types = [('CAN_DataFrame.BusChannel', 'u1'),
@@ -206,9 +193,9 @@ def main():
     sigs = []
 
     sig = Signal(
-        samples = np.core.records.fromarrays(arrayList=samples, dtype=np.dtype(types)),
+        samples = np.rec.fromarrays(samples, dtype=np.dtype(types)),   # The columns are passed as they are (already Numpy arrays), fromarrays copies them straight into the records
 
-        timestamps = timestampsList,
+        timestamps = timestamps,
         
         name='Channel_structure_composition',
         comment='Structure channel composition',
@@ -241,33 +228,106 @@ def main():
 ## Auxiliar functions ##
 ########################
 
-#Convert hex string to binary string (and pad the binary string with zeroes to the left to a defined length)
-def hexStr2binStr(hexStr:str, numBits:int) -> str:
-    return (bin(int(hexStr, 16))[2:].zfill(numBits) )
+# Parse the log lines that start between the byte offsets [start, end) of the file.
+# Returns the original lines, a dataframe with the log entry values (one row per line) and a 2D Numpy array with the 19 bytes of each CAN frame.
+# The lines and the dataframe are only needed for the CSV. If keepCsvData is False they are returned as None, so they don't have to be sent back from the worker process.
+# Lines with anormally short DataBytes are skipped.
+def ParseLogChunk(path:str, start:int, end:int, keepCsvData:bool) -> Tuple[Optional[pd.Series], Optional[pd.DataFrame], np.ndarray]:
+    """ We sniffed data using a Nexiq CAN sniffer. The application Device Tester software (v3.1.0.6) has a logging feature that we used to record the data.
+        The resulting log is not the actual CAN frame, but rather a proprietary format that includes the CAN frame plus extra info.
+    
+        Example of a line in the CAN sniffer's log:
+        000001.226604 (000.003827)  Rx() ID = 00 Ret = 0019 Sz = 02048 Blk = 1 Data:  00 11 EE B0 00 20 FF 00 03 00 FF 10 21 00 00 00 FF D0 FF
+            The actual data about the CAN packet is encoded in those last 19 hex bytes. 
+            This ID is unrelated to the CAN ID, so we'll name it differently (LogID) to avoid confusion.
+            We also parse Ret, Sz and Blk, although as far as I know we won't need them.
 
+        The whole column of lines is parsed at once (vectorized), instead of line by line.
+    """
 
-# Convert binary string to hex string
-def binStr2HexStr(binStr: str) -> str:
-    return( "{0:0>4X}".format(int(binStr, 2)) )
+    # Stream the chunk line by line and only keep the lines we need, instead of loading the whole chunk in memory first
+    # The file is read in binary mode to be able to seek to the chunk, so each line is decoded with the same encoding that open() uses in text mode (the locale's)
+    logEncoding = locale.getpreferredencoding(False)
+    lines = []
+    with open(path, "rb") as f_original:
+        f_original.seek(start)
+        pos = start
+        for line in f_original:
+            if (pos >= end): break  # This line belongs to the next chunk
+            pos += len(line)
+            if (b"Data:" in line): lines.append(line.decode(logEncoding, errors="replace").strip())   # Skip lines that have no data
 
+    lines = pd.Series(lines, dtype=str)
 
-# Convert hex string to list of ints
-def HexStrToListOfInts(hexStr) -> List[int]:
-    hexs = [hexStr[i:i+2] for i in range(0, len(hexStr), 2)]    # Separate hex: "A123EE"  ->  ["A1", "23", "EE"]
-    listOfInts = [int(x, 16) for x in hexs]                     # Convert hex list to int list
-    return(listOfInts)
+    # Get log entry timestamp, log info (ID, Ret, Sz, Blk) and data bytes, all at once
+    df = lines.str.extract(reLogLine)
 
+    if (not keepCsvData):   # Only the data bytes are needed for the MF4. Release the original lines and the other values right away
+        df = df[['LogDataBytes']]
+        del lines
 
-# Converts a whole dataframe's column from Hex strings to a list of ints
-def ColumnHexToListOfInts(df_col):
-    res = []
-    for item in df_col:
-        ints = HexStrToListOfInts(item)
-        res.append(ints)
-        
-    return(res)  
+    # Log entry data bytes (typically 19 bytes, the actual CAN frame is included here in a proprietary format)
+    df['LogDataBytes'] = df['LogDataBytes'].str.replace(" ", "", regex=False) # Remove spaces: " 00 11 EE B0 00 ..." -> "0011EEB000..."
+
+    isLongEnough = df['LogDataBytes'].str.len()//2 >= 19    # Skip lines with anormally short DataBytes (2 hexadecimal characters are 1 byte)
+    df    = df[isLongEnough].reset_index(drop=True)
+    frameBytes = ColumnHexToArrayOfBytes(df['LogDataBytes'].str[0:38], 19)   # Decode the hex of all frames at once into a Numpy array of bytes (19 bytes per row)
+
+    if (not keepCsvData): return( None, None, frameBytes )
+
+    lines = lines[isLongEnough].reset_index(drop=True)      # Keep the original lines aligned with the dataframe rows, for the CSV
+
+    return( lines, df, frameBytes )
+
+
+# Split a file in numChunks chunks of roughly the same size, cut at line boundaries. Returns a list of (start, end) byte offsets
+def FindChunkOffsets(path:str, numChunks:int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    offsets = [0]
+
+    with open(path, "rb") as f:
+        for k in range(1, numChunks):
+            f.seek(k*size//numChunks)
+            f.readline()    # Move forward to the start of the next line
+            offsets.append(max(f.tell(), offsets[-1]))
+
+    offsets.append(size)
+    return( list(zip(offsets[:-1], offsets[1:])) )
+
+
+# Converts a whole dataframe's column from Hex strings to a 2D Numpy array of bytes (one row per item)
+# All strings are joined and decoded at once. Items shorter than numBytes are padded with zeroes to the right
+def ColumnHexToArrayOfBytes(df_col, numBytes:int) -> np.ndarray:
+    hexAll = "".join(df_col.str.pad(numBytes*2, side='right', fillchar='0'))    # "A123EE", "0102..." -> "A123EE0000000000" + "0102..."
+    return( np.frombuffer(bytes.fromhex(hexAll), dtype=np.uint8).reshape(-1, numBytes) )
+
+
+
+# Load the PGN label table from its CSV. A copy is cached as Parquet next to it, which is faster to load on the next runs.
+# Parquet needs pyarrow or fastparquet. If neither is installed, the CSV is simply read every time.
+def LoadPgnTable(csvPath:str) -> pd.DataFrame:
+    parquetPath = str(Path(csvPath).with_suffix(".parquet"))
+
+    try:
+        if (os.path.getmtime(parquetPath) >= os.path.getmtime(csvPath)):   # Only use the cache if it is not older than the CSV
+            return( pd.read_parquet(parquetPath) )
+    except Exception:   # No cache yet, no Parquet engine, or a damaged cache file. In any case, just read the CSV
+        pass
+
+    pgn_table = pd.read_csv(csvPath, sep=';')
+
+    # Write the cache to a temporary file first and then move it into place, so an interrupted write never leaves a half written cache behind
+    tmpPath = parquetPath + ".tmp"
+    try:
+        pgn_table.to_parquet(tmpPath)
+        os.replace(tmpPath, parquetPath)
+    except Exception:   # The cache is optional, so failing to write it is not an error
+        if os.path.exists(tmpPath): os.remove(tmpPath)
+
+    return(pgn_table)
 
 
 
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file